@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, Dict, List
 
 import cv2
 import matplotlib.pyplot as plt
@@ -14,6 +14,8 @@ class debugPlot:
     sameImageValues: List[float]
     fig: Any
     axd: Any
+    images: Dict[str, Any]
+    lines: Dict[str, Any]
 
     def __init__(self):
         self.mseValues: List[float] = list()
@@ -27,6 +29,53 @@ class debugPlot:
         self.fig = fig
         self.axd = axd
 
+        # All artists get created once and only their data gets updated afterwards
+        self.axd["refImg"].set_title("Ref Image")
+        self.axd["curImg"].set_title("Cur Image")
+        self.axd["difImg"].set_title("Dif Image")
+        self.images = {}
+
+        self.lines = {}
+        (self.lines["mse"],) = self.axd["plot"].plot([], [], "bx-", label="MSE over Time")
+        (self.lines["ssim"],) = self.axd["plot"].plot([], [], "rx-", label="SSIM over Time")
+        (self.lines["same"],) = self.axd["plot"].plot([], [], "gx-", label="Same Image")
+        self.axd["plot"].set_title("MSE over Time")
+        self.axd["plot"].set_xlabel("Iterations")
+        self.axd["plot"].set_ylabel("MSE")
+        self.axd["plot"].legend()
+
+    def __to_rgb(self, img: cv2.typing.MatLike) -> cv2.typing.MatLike:
+        """
+        Converts the given BGR or grayscale image to RGB for plotting it.
+
+        Args:
+            img (cv2.typing.MatLike): The BGR or single channel grayscale image.
+
+        Returns:
+            cv2.typing.MatLike: The RGB image.
+        """
+        if img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    def __update_image(self, name: str, img: cv2.typing.MatLike) -> None:
+        """
+        Updates the image shown in the given axis. The image artist only gets created on the first call.
+
+        Args:
+            name (str): The name of the axis to show the image in.
+            img (cv2.typing.MatLike): The BGR or grayscale image to show.
+        """
+        rgbImg: cv2.typing.MatLike = self.__to_rgb(img)
+        if name not in self.images:
+            self.images[name] = self.axd[name].imshow(rgbImg)
+            return
+
+        self.images[name].set_data(rgbImg)
+        # The image size changes in case e.g. a stage uses a different reference image or region of interest
+        h, w = rgbImg.shape[:2]
+        self.images[name].set_extent((-0.5, w - 0.5, h - 0.5, -0.5))
+
     def update_plot(
         self,
         refImg: cv2.typing.MatLike,
@@ -51,27 +100,17 @@ class debugPlot:
         self.ssimValues.append(ssim)
         self.sameImageValues.append(same)
 
-        # Plot the images. Convert images from BGR to RBG.
-        self.axd["refImg"].clear()
-        self.axd["refImg"].imshow(cv2.cvtColor(refImg, cv2.COLOR_BGR2RGB))
-        self.axd["refImg"].set_title("Ref Image")
-
-        self.axd["curImg"].clear()
-        self.axd["curImg"].imshow(cv2.cvtColor(curImg, cv2.COLOR_BGR2RGB))
-        self.axd["curImg"].set_title("Cur Image")
-
-        self.axd["difImg"].clear()
-        self.axd["difImg"].imshow(cv2.cvtColor(difImage, cv2.COLOR_BGR2RGB))
-        self.axd["difImg"].set_title("Dif Image")
+        # Plot the images. Convert images from BGR (or grayscale) to RBG.
+        self.__update_image("refImg", refImg)
+        self.__update_image("curImg", curImg)
+        self.__update_image("difImg", difImage)
 
         # Plot MSE over time
-        self.axd["plot"].clear()
-        self.axd["plot"].plot(self.mseValues, "bx-", label="MSE over Time")
-        self.axd["plot"].plot(self.ssimValues, "rx-", label="SSIM over Time")
-        self.axd["plot"].plot(self.sameImageValues, "gx-", label="Same Image")
-        self.axd["plot"].set_title("MSE over Time")
-        self.axd["plot"].set_xlabel("Iterations")
-        self.axd["plot"].set_ylabel("MSE")
-        self.axd["plot"].legend()
+        x: List[int] = list(range(len(self.mseValues)))
+        self.lines["mse"].set_data(x, self.mseValues)
+        self.lines["ssim"].set_data(x, self.ssimValues)
+        self.lines["same"].set_data(x, self.sameImageValues)
+        self.axd["plot"].relim()
+        self.axd["plot"].autoscale_view()
 
         plt.pause(0.001)  # Allows the plot to update
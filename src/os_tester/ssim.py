@@ -0,0 +1,152 @@
+from typing import Any, Tuple
+
+import cv2
+import numpy as np
+
+# Numba is optional. Without it the SSIM map gets combined via NumPy.
+try:
+    from numba import njit, prange  # type: ignore
+
+    NUMBA_AVAILABLE: bool = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Gaussian window and constants as defined by the original SSIM paper
+# Ref: https://ece.uwaterloo.ca/~z70wang/research/ssim/
+GAUSS_KSIZE: Tuple[int, int] = (11, 11)
+GAUSS_SIGMA: float = 1.5
+C1: float = (0.01 * 255) ** 2
+C2: float = (0.03 * 255) ** 2
+
+# Border that gets ignored when averaging the SSIM map since the Gaussian window does not fully fit there
+BORDER: int = (GAUSS_KSIZE[0] - 1) // 2
+
+
+class ssimStats:
+    """
+    The Gaussian weighted local statistics of a single image required to calculate the structural similarity index.
+    Those only depend on the image itself, so they can be calculated once per image and then be reused for every comparison.
+    The image is stored as float32, so it does not have to be converted again for every comparison.
+    """
+
+    img: np.ndarray
+    mu: np.ndarray
+    # mu^2 + C1 / 2 and sigma^2 + C2 / 2.
+    # Pre-scaled, so the SSIM denominator of two images only requires summing up their values.
+    muSqC1: np.ndarray
+    sigmaSqC2: np.ndarray
+
+    def __init__(self, img: cv2.typing.MatLike):
+        self.img = np.asarray(img, dtype=np.float32)
+        self.mu = cv2.GaussianBlur(self.img, GAUSS_KSIZE, GAUSS_SIGMA)
+        muSq: np.ndarray = self.mu * self.mu
+        self.sigmaSqC2 = cv2.GaussianBlur(self.img * self.img, GAUSS_KSIZE, GAUSS_SIGMA) - muSq + C2 / 2
+        self.muSqC1 = muSq + C1 / 2
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _ssim_mean_numba(  # pylint: disable=too-many-locals
+        muA: Any,
+        muB: Any,
+        muASqC1: Any,
+        muBSqC1: Any,
+        sigmaASqC2: Any,
+        sigmaBSqC2: Any,
+        blurAB: Any,
+        y0: int,
+        y1: int,
+        x0: int,
+        x1: int,
+    ) -> float:
+        """
+        Fuses the per pixel SSIM combination and averaging into a single parallel pass without allocating temporary maps.
+        All arrays are 2D (H x W*C) and only the window [y0, y1) x [x0, x1) gets averaged.
+        """
+        total: float = 0.0
+        for y in prange(y0, y1):  # pylint: disable=not-an-iterable
+            rowSum: float = 0.0
+            for x in range(x0, x1):
+                muAB: float = muA[y, x] * muB[y, x]
+                sigmaAB: float = blurAB[y, x] - muAB
+                num: float = (2 * muAB + C1) * (2 * sigmaAB + C2)
+                den: float = (muASqC1[y, x] + muBSqC1[y, x]) * (sigmaASqC2[y, x] + sigmaBSqC2[y, x])
+                rowSum += num / den
+            total += rowSum
+        return total / ((y1 - y0) * (x1 - x0))
+
+
+def warm_up() -> None:
+    """
+    Triggers the Numba JIT compilation of the SSIM kernel, so it does not happen during the first comparison.
+    Does nothing in case Numba is not available.
+    """
+    if NUMBA_AVAILABLE:
+        img: np.ndarray = np.zeros((2 * BORDER + 1, 2 * BORDER + 1), dtype=np.uint8)
+        stats: ssimStats = ssimStats(img)
+        ssim(stats, stats)
+
+
+def downsample(img: cv2.typing.MatLike) -> cv2.typing.MatLike:
+    """
+    Downsamples the given image by F = max(1, round(min(H, W) / 256)) as recommended for calculating the structural similarity index.
+    The SSIM cost scales with the pixel count and a scale of roughly 256 pixels on the short side is sufficient for detecting UI states.
+
+    Args:
+        img (cv2.typing.MatLike): The image to downsample.
+
+    Returns:
+        cv2.typing.MatLike: The downsampled image or the image itself in case F is 1.
+    """
+    h, w = img.shape[:2]
+    f: int = max(1, round(min(h, w) / 256))
+    if f <= 1:
+        return img
+    return cv2.resize(img, (w // f, h // f), interpolation=cv2.INTER_AREA)
+
+
+def ssim(a: ssimStats, b: ssimStats) -> float:
+    """
+    Calculates the mean structural similarity index between two images based on their precomputed statistics.
+    Only the cross covariance of both images has to be calculated here.
+    Both images have to have the same size and number of channels.
+
+    Args:
+        a (ssimStats): The statistics of the first image.
+        b (ssimStats): The statistics of the second image.
+
+    Returns:
+        float: The mean structural similarity index in the range of [-1, 1].
+    """
+    blurAB: np.ndarray = cv2.GaussianBlur(a.img * b.img, GAUSS_KSIZE, GAUSS_SIGMA)
+
+    h, w = blurAB.shape[:2]
+    border: int = BORDER if h > 2 * BORDER and w > 2 * BORDER else 0
+
+    if NUMBA_AVAILABLE:
+        # View all maps as 2D (H x W*C) so a single kernel handles gray and color images
+        c: int = blurAB.size // (h * w)
+        return float(
+            _ssim_mean_numba(
+                a.mu.reshape(h, -1),
+                b.mu.reshape(h, -1),
+                a.muSqC1.reshape(h, -1),
+                b.muSqC1.reshape(h, -1),
+                a.sigmaSqC2.reshape(h, -1),
+                b.sigmaSqC2.reshape(h, -1),
+                blurAB.reshape(h, -1),
+                border,
+                h - border,
+                border * c,
+                (w - border) * c,
+            ),
+        )
+
+    muAB: np.ndarray = a.mu * b.mu
+    sigmaAB: np.ndarray = blurAB - muAB
+
+    num: np.ndarray = (2 * muAB + C1) * (2 * sigmaAB + C2)
+    den: np.ndarray = (a.muSqC1 + b.muSqC1) * (a.sigmaSqC2 + b.sigmaSqC2)
+    ssimMap: np.ndarray = num / den
+    return float(ssimMap[border : h - border, border : w - border].mean())
@@ -1,9 +1,69 @@
 import sys
 from os import path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+import cv2
 import yaml  # type: ignore
 
+from os_tester.ssim import downsample, ssimStats
+
+
+class reference:
+    """
+    The reference image of a stage prepared for comparing screenshoots against it.
+    """
+
+    roi: Optional[Tuple[int, int, int, int]]
+    useColor: bool
+
+    img: cv2.typing.MatLike
+    cmpImg: cv2.typing.MatLike
+    ssim: ssimStats
+
+    def __init__(self, checkDict: Dict[str, Any]):
+        self.roi = None
+        if "roi" in checkDict:
+            roi: Dict[str, int] = checkDict["roi"]
+            self.roi = (roi["x"], roi["y"], roi["w"], roi["h"])
+        self.useColor = checkDict["use_color"] if "use_color" in checkDict else False
+
+    def crop_roi(self, img: cv2.typing.MatLike) -> cv2.typing.MatLike:
+        """
+        Crops the given image to the region of interest without copying it.
+
+        Args:
+            img (cv2.typing.MatLike): The image to crop.
+
+        Returns:
+            cv2.typing.MatLike: A view of the region of interest of the image or the image itself in case no region of interest is defined.
+        """
+        if self.roi is None:
+            return img
+        x, y, w, h = self.roi
+        return img[y : y + h, x : x + w]
+
+    def load(self, refImgPath: str, refImg: cv2.typing.MatLike, refGrayImg: cv2.typing.MatLike) -> None:
+        """
+        Prepares everything required for comparing against the given reference image.
+        This includes selecting grayscale or color and precomputing the SSIM statistics of its downsampled region of interest.
+
+        Args:
+            refImgPath (str): Path to the reference image.
+            refImg (cv2.typing.MatLike): The decoded BGR reference image.
+            refGrayImg (cv2.typing.MatLike): The grayscale version of the reference image.
+        """
+        self.img = refImg
+        self.cmpImg = refImg if self.useColor else refGrayImg
+
+        if self.roi:
+            x, y, w, h = self.roi
+            hRef, wRef = refImg.shape[:2]
+            if min(x, y) < 0 or min(w, h) <= 0 or x + w > wRef or y + h > hRef:
+                print(f"Stage ROI {self.roi} is outside of the ref image '{refImgPath}' ({wRef}x{hRef})!")
+                sys.exit(4)
+
+        self.ssim = ssimStats(downsample(self.crop_roi(self.cmpImg)))
+
 
 class stage:
     """
@@ -16,6 +76,7 @@ class stage:
     checkMseLeq: float
     checkSsimGeq: float
     actions: List[Dict[str, Any]]
+    ref: reference
 
     def __init__(self, stageDict: Dict[str, Any], basePath: str):
         self.name = stageDict["stage"]
@@ -24,6 +85,7 @@ class stage:
         self.checkMseLeq = stageDict["check"]["mse_leq"]
         self.checkSsimGeq = stageDict["check"]["ssim_geq"]
         self.actions = stageDict["actions"] if "actions" in stageDict else list()
+        self.ref = reference(stageDict["check"])
 
 
 class stages:
@@ -58,6 +120,34 @@ class stages:
         for stageDict in stagesDict["stages"]:
             self.stagesList.append(stage(stageDict, self.basePath))
 
+    def __load_references(self) -> None:
+        """
+        Decodes the reference images of all stages in 'self.stagesList', so this does not happen while waiting for a stage.
+        Every file gets only decoded once, even if it is used by multiple stages.
+        """
+        refImgs: Dict[str, Tuple[cv2.typing.MatLike, cv2.typing.MatLike]] = {}
+
+        stageObj: stage
+        for stageObj in self.stagesList:
+            refImgPath: str = stageObj.checkFile
+            if refImgPath not in refImgs:
+                if not path.exists(refImgPath):
+                    print(f"Stage ref image file '{refImgPath}' not found!")
+                    sys.exit(2)
+
+                if not path.isfile(refImgPath):
+                    print(f"Stage ref image file '{refImgPath}' is no file!")
+                    sys.exit(3)
+
+                refImg: Optional[cv2.typing.MatLike] = cv2.imread(refImgPath)
+                if refImg is None:
+                    print(f"Stage ref image file '{refImgPath}' is no valid image!")
+                    sys.exit(5)
+                refImgs[refImgPath] = (refImg, cv2.cvtColor(refImg, cv2.COLOR_BGR2GRAY))
+
+            stageObj.ref.load(refImgPath, *refImgs[refImgPath])
+
     def __init__(self, basePath: str):
         self.basePath = basePath
         self.__load_stages()
+        self.__load_references()
@@ -1,21 +1,42 @@
 import json
-import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import suppress
-from os import path, remove
+from threading import Event, Lock
 from time import sleep, time
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import cv2
 import libvirt
 import libvirt_qemu
 import numpy as np
-from skimage.metrics import structural_similarity as ssimFunc
 
 from os_tester.debug_plot import debugPlot
+from os_tester.ssim import downsample, ssim, ssimStats, warm_up
 from os_tester.stages import stage, stages
 
+# Maximum number of key presses sent as part of a single qemu monitor command for keyboard_text actions.
+# Every key press consists of a down and an up event. The QEMU USB HID keyboard (usb-kbd) only queues 16 key events and drops the rest.
+# Extended keys (e.g. arrow keys) take two queue entries per event, so use keyboard_key actions for those.
+# Ref: https://gitlab.com/qemu-project/qemu/-/blob/master/hw/input/hid.c (QUEUE_LENGTH)
+KEYBOARD_TEXT_BATCH_SIZE: int = 8
 
-class vm:
+# Maximum value of a single 8 bit image channel used for normalizing the MSE to [0, 1]
+MAX_PIXEL_VALUE: float = 255
+
+# The delay in seconds between taking two screenshoots while waiting for a stage
+POLL_INTERVAL_S: float = 1
+
+# Pre-rendered JSON templates for the qemu monitor 'input-send-event' command and its events.
+# Avoids building and serializing a dict for every input event.
+# Ref: https://qemu.readthedocs.io/en/latest/interop/qemu-qmp-ref.html
+INPUT_SEND_EVENT_TMPL: str = '{"execute": "input-send-event", "arguments": {"events": [%s]}}'
+KEY_EVENT_TMPL: str = '{"type": "key", "data": {"down": %s, "key": {"type": "qcode", "data": %s}}}'
+BTN_EVENT_TMPL: str = '{"type": "btn", "data": {"down": %s, "button": %s}}'
+AXIS_EVENT_TMPL: str = '{"type": "%s", "data": {"axis": "%s", "value": %d}}'
+
+
+# The lock, action table and cached screen size are per VM runtime state on top of the connection details, splitting them up would only add indirection
+class vm:  # pylint: disable=too-many-instance-attributes
     """
     A wrapper around a qemu libvirt VM that handles the live time and stage execution.
     """
@@ -26,6 +47,9 @@ class vm:
 
     vmDom: Optional[libvirt.virDomain]
     debugPlotObj: debugPlot
+    screenSize: Optional[Tuple[int, int]]
+    actionHandlers: Dict[str, Callable[[Any], None]]
+    libvirtLock: Lock
 
     def __init__(
         self,
@@ -40,6 +64,21 @@ class vm:
             self.debugPlotObj = debugPlot()
 
         self.vmDom = None
+        self.screenSize = None
+        # Serializes libvirt calls, since screenshoots get taken from a worker thread
+        self.libvirtLock = Lock()
+
+        # Maps stage action names to the method performing them
+        self.actionHandlers = {
+            "mouse_move": self.__send_mouse_move_action,
+            "mouse_click": self.__send_mouse_click_action,
+            "keyboard_key": self.__send_keyboard_key_action,
+            "keyboard_text": self.__send_keyboard_text_action,
+            "reboot": self.__reboot_action,
+        }
+
+        # Compile the SSIM kernel upfront instead of during the first stage
+        warm_up()
 
     def __perform_stage_actions(self, stageObj: stage) -> None:
         """
@@ -49,27 +88,33 @@ class vm:
             stageObj (stage): The stage the actions should be performed for.
         """
         for action in stageObj.actions:
-            if "mouse_move" in action:
-                self.__send_mouse_move_action(action["mouse_move"])
-            elif "mouse_click" in action:
-                self.__send_mouse_click_action(action["mouse_click"])
-            elif "keyboard_key" in action:
-                self.__send_keyboard_key_action(action["keyboard_key"])
-            elif "keyboard_text" in action:
-                self.__send_keyboard_text_action(action["keyboard_text"])
-            elif "reboot" in action:
-                assert self.vmDom
-                self.vmDom.reboot()
-            else:
+            # Every action is a dict with exactly one entry: {<action name>: <action arguments>}
+            if len(action) != 1:
                 raise Exception(f"Invalid stage action: {action}")
+            ((name, args),) = action.items()
+
+            if name not in self.actionHandlers:
+                raise Exception(f"Invalid stage action: {action}")
+            self.actionHandlers[name](args)
+
+    def __reboot_action(self, _: Any) -> None:
+        """
+        Requests the VM to reboot.
+
+        Args:
+            _ (Any): The reboot action has no arguments.
+        """
+        assert self.vmDom
+        self.vmDom.reboot()
+        self.invalidate_screen_size()
 
     def __img_mse(
         self,
         curImg: cv2.typing.MatLike,
         refImg: cv2.typing.MatLike,
-    ) -> Tuple[float, cv2.typing.MatLike]:
+    ) -> float:
         """
-        Calculates the mean square error between two given images.
+        Calculates the mean square error between two given images with pixel values normalized to [0, 1].
         Both images have to have the same size.
 
         Args:
@@ -77,50 +122,54 @@ class vm:
             refImg (cv2.typing.MatLike): The reference image we are awaiting.
 
         Returns:
-            Tuple[float, cv2.typing.MatLike]: A tuple of the mean square error and the image diff.
+            float: The mean square error between both images in the range of [0, 1].
         """
-        # Compute the difference
-        imgDif: cv2.typing.MatLike = cv2.subtract(curImg, refImg)
-        err = np.sum(imgDif**2)
+        # Sum of squared differences in a single pass without allocating a diff image
+        err: float = cv2.norm(curImg, refImg, cv2.NORM_L2SQR)
 
-        # Compute Mean Squared Error
-        h, w = curImg.shape[:2]
-        mse = err / (float(h * w))
-
-        mse = min(
-            mse,
-            10,
-        )  # Values over 10 do not make sense for our case and it makes it easier to plot it
-        return mse, imgDif
+        # Compute Mean Squared Error.
+        # Normalize by the maximum squared pixel difference, so the result does not depend on the number of channels or the pixel value range.
+        return err / (float(curImg.size) * MAX_PIXEL_VALUE**2)
 
     def __comp_images(
         self,
         curImg: cv2.typing.MatLike,
-        refImg: cv2.typing.MatLike,
-    ) -> Tuple[float, float, cv2.typing.MatLike]:
+        stageObj: stage,
+    ) -> Tuple[float, Optional[float], Optional[cv2.typing.MatLike]]:
         """
         Compares the provided images and calculates the mean square error and structural similarity index.
         Based on: https://www.tutorialspoint.com/how-to-compare-two-images-in-opencv-python
 
         Args:
-            curImg (cv2.typing.MatLike): The current image taken from the VM.
-            refImg (cv2.typing.MatLike): The reference image we are awaiting.
+            curImg (cv2.typing.MatLike): The current image taken from the VM, already resized to the reference image dimensions. Grayscale, unless the stage uses color.
+            stageObj (stage): The stage we are awaiting. Provides the preloaded reference image, region of interest and thresholds.
+            In case the mean square error threshold is not reached, the SSIM calculation gets skipped.
 
         Returns:
-            Tuple[float, float, cv2.typing.MatLike]: A tuple consisting of the mean square error, structural similarity index and a image diff of both images.
+            Tuple[float, Optional[float], Optional[cv2.typing.MatLike]]: A tuple consisting of the mean square error, structural similarity index and a image diff of both images.
+            The structural similarity index is None in case it was skipped since the mean square error already ruled out a match.
+            The image diff is only computed in case 'self.debugPlt' is set and None otherwise.
+            All values only cover the region of interest of the stage.
         """
-        # Get the dimensions of the original image
-        hRef, wRef = refImg.shape[:2]
+        # Only compare the region of interest
+        curImgRoi: cv2.typing.MatLike = stageObj.ref.crop_roi(curImg)
+        refImgRoi: cv2.typing.MatLike = stageObj.ref.crop_roi(stageObj.ref.cmpImg)
 
-        # Resize the reference image to match the original image's dimensions
-        curImgResized = cv2.resize(curImg, (wRef, hRef))
+        mse: float = self.__img_mse(curImgRoi, refImgRoi)
 
-        mse: float
-        difImg: cv2.typing.MatLike
-        mse, difImg = self.__img_mse(curImgResized, refImg)
+        # The diff image is only required for plotting
+        difImg: Optional[cv2.typing.MatLike] = cv2.absdiff(curImgRoi, refImgRoi) if self.debugPlt else None
+
+        # SSIM is by far more expensive than MSE. Skip it in case the MSE already decides the result.
+        if mse >= stageObj.checkMseLeq:
+            return (mse, None, difImg)
+        if mse <= 0:
+            # Identical images always have a SSIM of 1
+            return (mse, 1.0, difImg)
 
-        # Compute SSIM
-        ssimIndex: float = ssimFunc(curImgResized, refImg, channel_axis=-1)
+        # Compute SSIM on a downsampled version of both images.
+        # The reference image statistics are precomputed, so only the current image side has to be calculated.
+        ssimIndex: float = ssim(ssimStats(downsample(curImgRoi)), stageObj.ref.ssim)
 
         return (mse, ssimIndex, difImg)
 
@@ -131,38 +180,71 @@ class vm:
         Args:
             stageObj (stage): The stage we want to await for.
         """
-        refImgPath: str = stageObj.checkFile
-        if not path.exists(refImgPath):
-            print(f"Stage ref image file '{refImgPath}' not found!")
-            sys.exit(2)
+        prevBuf: Optional[bytearray] = None
+        stopEvent: Event = Event()
+        # A single worker takes the next screenshot while the current one gets compared
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="os_tester_screenshot") as executor:
+            future: Future = executor.submit(self.__recv_screenshot_delayed, 0, stopEvent)
+            try:
+                while True:
+                    imgType: Any
+                    buf: bytearray
+                    imgType, buf = future.result()
+                    print("Screenshoot taken.")
+
+                    # Request the next screenshot right away. It gets taken after POLL_INTERVAL_S, independent of how long comparing this one takes.
+                    future = executor.submit(self.__recv_screenshot_delayed, POLL_INTERVAL_S, stopEvent)
+
+                    # libvirt does not notify about framebuffer updates.
+                    # Instead skip decoding and comparing in case the screen did not change since the last poll.
+                    if buf == prevBuf:
+                        print("Screen unchanged.")
+                        continue
+                    prevBuf = buf
+
+                    # Break if it's the same image
+                    if self.__check_screenshot(imgType, buf, stageObj):
+                        break
+            finally:
+                # Abort the pending screenshot instead of waiting for it
+                stopEvent.set()
+
+    def __check_screenshot(self, imgType: Any, buf: bytearray, stageObj: stage) -> bool:
+        """
+        Decodes the given screenshoot and compares it against the reference image of the given stage.
 
-        if not path.isfile(refImgPath):
-            print(f"Stage ref image file '{refImgPath}' is no file!")
-            sys.exit(3)
+        Args:
+            imgType (Any): The image (mime) type reported by libvirt.
+            buf (bytearray): The raw image bytes as received by '__recv_screenshot'.
+            stageObj (stage): The stage we want to await for.
 
-        refImg: cv2.typing.MatLike = cv2.imread(refImgPath)
+        Returns:
+            bool: True in case the screenshoot matches the stage reference image.
+        """
+        curImg: cv2.typing.MatLike = self.__decode_screenshot(imgType, buf)
+        # Luminance is sufficient for detecting UI states and a third of the work
+        curCmpImg: cv2.typing.MatLike = curImg if stageObj.ref.useColor else cv2.cvtColor(curImg, cv2.COLOR_BGR2GRAY)
 
-        while True:
-            curImgPath: str = f"/tmp/{self.uuid}_check.png"
-            self.take_screenshot(curImgPath)
-            print("Screenshoot taken.")
-            curImg: cv2.typing.MatLike = cv2.imread(curImgPath)
+        # Resize the current image to match the reference image's dimensions.
+        # Usually the VM resolution matches the reference image, so this gets skipped.
+        if curCmpImg.shape[:2] != stageObj.ref.cmpImg.shape[:2]:
+            hRef, wRef = stageObj.ref.cmpImg.shape[:2]
+            curCmpImg = cv2.resize(curCmpImg, (wRef, hRef))
 
-            mse: float
-            ssimIndex: float
-            difImg: cv2.typing.MatLike
-            mse, ssimIndex, difImg = self.__comp_images(curImg, refImg)
+        mse: float
+        ssimIndex: Optional[float]
+        difImg: Optional[cv2.typing.MatLike]
+        mse, ssimIndex, difImg = self.__comp_images(curCmpImg, stageObj)
 
-            same: float = 1 if mse < stageObj.checkMseLeq and ssimIndex > stageObj.checkSsimGeq else 0
+        # A skipped SSIM calculation means the MSE already ruled out a match
+        same: float = 1 if ssimIndex is not None and mse < stageObj.checkMseLeq and ssimIndex > stageObj.checkSsimGeq else 0
 
-            print(f"MSE: {mse}, SSIM: {ssimIndex}, Images Same: {same}")
-            if self.debugPlt:
-                self.debugPlotObj.update_plot(refImg, curImg, difImg, mse, ssimIndex, same)
+        print(f"MSE: {mse}, SSIM: {ssimIndex}, Images Same: {same}")
+        if self.debugPlt:
+            assert difImg is not None
+            self.debugPlotObj.update_plot(stageObj.ref.img, curImg, difImg, mse, ssimIndex if ssimIndex is not None else 0, same)
 
-            # Break if it's the same image
-            if same >= 1:
-                break
-            sleep(1)
+        return same >= 1
 
     def __run_stage(self, stageObj: stage) -> None:
         """
@@ -198,6 +280,7 @@ class vm:
         """
         with suppress(libvirt.libvirtError):
             self.vmDom = self.conn.lookupByUUIDString(self.uuid)
+            self.invalidate_screen_size()
             return self.vmDom is not None
         return False
 
@@ -231,106 +314,206 @@ class vm:
                 )
 
         self.vmDom = self.conn.createXML(vmXml, 0)
+        self.invalidate_screen_size()
 
-    def take_screenshot(self, targetPath: str) -> None:
+    def __recv_screenshot_delayed(self, delayS: float, stopEvent: Event) -> Tuple[Any, bytearray]:
         """
-        Takes a screenshoot of the current VM output and stores it as a file.
+        Waits for the given delay and then takes a screenshoot of the current VM output.
+        Meant to be run by a worker thread, so the next screenshoot gets taken while the current one is being compared.
 
         Args:
-            targetPath (str): Where to store the screenshoot at.
+            delayS (float): The delay in seconds to wait before taking the screenshoot.
+            stopEvent (Event): Aborts waiting and returns without taking a screenshoot once set.
+
+        Returns:
+            Tuple[Any, bytearray]: A tuple of the image (mime) type reported by libvirt and the raw image bytes. (None, empty bytearray) in case it got aborted.
         """
-        stream: libvirt.virStream = self.conn.newStream()
+        if stopEvent.wait(delayS):
+            return (None, bytearray())
+        return self.__recv_screenshot()
 
-        assert self.vmDom
-        imgType: Any = self.vmDom.screenshot(stream, 0)
+    def __recv_screenshot(self) -> Tuple[Any, bytearray]:
+        """
+        Takes a screenshoot of the current VM output and receives it into memory.
 
-        with open(targetPath, "wb") as f:
+        Returns:
+            Tuple[Any, bytearray]: A tuple of the image (mime) type reported by libvirt and the raw image bytes.
+        """
+        with self.libvirtLock:
+            stream: libvirt.virStream = self.conn.newStream()
+
+            assert self.vmDom
+            imgType: Any = self.vmDom.screenshot(stream, 0)
+
+            buf: bytearray = bytearray()
             streamBytes = stream.recv(262120)
             while streamBytes != b"":
-                f.write(streamBytes)
+                buf.extend(streamBytes)
                 streamBytes = stream.recv(262120)
 
+            stream.finish()
+        return (imgType, buf)
+
+    def take_screenshot(self, targetPath: str) -> None:
+        """
+        Takes a screenshoot of the current VM output and stores it as a file.
+
+        Args:
+            targetPath (str): Where to store the screenshoot at.
+        """
+        imgType: Any
+        buf: bytearray
+        imgType, buf = self.__recv_screenshot()
+
+        with open(targetPath, "wb") as f:
+            f.write(buf)
+
         print(f"Screenshot saved as type '{imgType}' under '{targetPath}'.")
-        stream.finish()
 
-    def __get_screen_size(self) -> Tuple[int, int]:
+    def take_screenshot_to_buffer(self) -> cv2.typing.MatLike:
         """
-        Helper function returning the VM screen size by taking a screenshoot and using this image than as width and height.
+        Takes a screenshoot of the current VM output and decodes it directly from memory without a round trip through the file system.
 
         Returns:
-            Tuple[int, int]: width and height
+            cv2.typing.MatLike: The decoded BGR screenshoot.
         """
-        filePath: str = f"/tmp/{self.uuid}_screen_size.png"
-        self.take_screenshot(filePath)
+        imgType: Any
+        buf: bytearray
+        imgType, buf = self.__recv_screenshot()
+        return self.__decode_screenshot(imgType, buf)
+
+    def __decode_ppm(self, buf: bytearray) -> Optional[cv2.typing.MatLike]:
+        """
+        Decodes a binary 8 bit PPM (P6) image by parsing its header and viewing the pixel data as an array.
+        This avoids a generic image decoder since the pixel data is not compressed.
+        Ref: https://netpbm.sourceforge.net/doc/ppm.html
+
+        Args:
+            buf (bytearray): The raw PPM image bytes.
+
+        Returns:
+            Optional[cv2.typing.MatLike]: The decoded BGR image or None in case the image is no binary 8 bit PPM.
+        """
+        # The header consists of the magic number, width, height and max value separated by whitespaces and optional comments
+        fields: List[int] = list()
+        pos: int = 2
+        while len(fields) < 3:
+            while pos < len(buf) and (chr(buf[pos]).isspace() or buf[pos] == ord("#")):
+                if buf[pos] == ord("#"):
+                    pos = buf.find(b"\n", pos)
+                    if pos < 0:
+                        return None
+                pos += 1
+            start: int = pos
+            while pos < len(buf) and chr(buf[pos]).isdigit():
+                pos += 1
+            if start == pos:
+                return None
+            fields.append(int(buf[start:pos]))
+        # Exactly one whitespace separates the header from the pixel data
+        pos += 1
+
+        w, h, maxVal = fields[0], fields[1], fields[2]
+        if not buf.startswith(b"P6") or maxVal != 255 or len(buf) - pos < w * h * 3:
+            return None
+
+        img: np.ndarray = np.frombuffer(buf, np.uint8, count=w * h * 3, offset=pos).reshape(h, w, 3)
+        return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+    def __decode_screenshot(self, imgType: Any, buf: bytearray) -> cv2.typing.MatLike:
+        """
+        Decodes the raw screenshoot bytes received from libvirt.
+        Uncompressed PPM images (the QEMU default) get decoded directly. Everything else (e.g. PNG) is passed to OpenCV.
 
-        img: cv2.typing.MatLike = cv2.imread(filePath)
+        Args:
+            imgType (Any): The image (mime) type reported by libvirt.
+            buf (bytearray): The raw image bytes as received by '__recv_screenshot'.
 
-        # Delete screen shoot again since we do not need it any more
-        remove(filePath)
+        Returns:
+            cv2.typing.MatLike: The decoded BGR screenshoot.
+        """
+        img: Optional[cv2.typing.MatLike] = None
+        if imgType == "image/x-portable-pixmap":
+            img = self.__decode_ppm(buf)
+        if img is None:
+            img = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise Exception(f"Failed to decode screenshoot of type '{imgType}'.")
 
+        # Remember the screen size, so mouse actions do not require a screenshoot of their own
         h, w = img.shape[:2]
-        return (w, h)
+        self.screenSize = (w, h)
+        return img
 
-    def __send_action(self, cmdDict: Dict[str, Any]) -> Optional[Any]:
+    def __get_screen_size(self) -> Tuple[int, int]:
+        """
+        Helper function returning the VM screen size.
+        The size gets cached from the last screenshoot taken. Only in case there is none, a new screenshoot is taken.
+
+        Returns:
+            Tuple[int, int]: width and height
+        """
+        if self.screenSize is None:
+            self.take_screenshot_to_buffer()
+        assert self.screenSize
+        return self.screenSize
+
+    def invalidate_screen_size(self) -> None:
+        """
+        Drops the cached VM screen size, so it gets measured again on the next mouse action.
+        Should be called in case the VM display mode changed.
+        """
+        self.screenSize = None
+
+    def __send_action(self, cmd: str) -> Optional[Any]:
         """
         Sends a qemu monitor command to the VM.
         Ref: https://en.wikibooks.org/wiki/QEMU/Monitor
 
         Args:
-            cmdDict (Dict[str, Any]): A dict defining the qemu monitor command.
+            cmd (str): The JSON encoded qemu monitor command.
 
         Returns:
             Optional[Any]: The qemu execution result.
         """
-        cmd: str = json.dumps(cmdDict)
         try:
-            response: Any = libvirt_qemu.qemuMonitorCommand(self.vmDom, cmd, 0)
+            with self.libvirtLock:
+                response: Any = libvirt_qemu.qemuMonitorCommand(self.vmDom, cmd, 0)
             print(f"Action response: {response}")
             return response
         except libvirt.libvirtError as e:
             print(f"Failed to send action event: {e}")
         return None
 
+    def __send_input_events(self, events: List[str]) -> Optional[Any]:
+        """
+        Sends the given input events as a single 'input-send-event' qemu monitor command.
+
+        Args:
+            events (List[str]): The JSON encoded input events created from the '*_EVENT_TMPL' templates.
+
+        Returns:
+            Optional[Any]: The qemu execution result.
+        """
+        return self.__send_action(INPUT_SEND_EVENT_TMPL % ", ".join(events))
+
     def __send_keyboard_text_action(self, keyboardText: Dict[str, Any]) -> None:
         """
         Sends a row of key press events via the qemu monitor.
+        The key presses get batched into a single qemu monitor command per KEYBOARD_TEXT_BATCH_SIZE keys.
 
         Args:
             keyboardText (Dict[str, Any]): The dict defining the text to send and how.
         """
-        for c in keyboardText["value"]:
-            cmdDictDown: Dict[str, Any] = {
-                "execute": "input-send-event",
-                "arguments": {
-                    "events": [
-                        {
-                            "type": "key",
-                            "data": {
-                                "down": True,
-                                "key": {"type": "qcode", "data": c},
-                            },
-                        },
-                    ],
-                },
-            }
-            self.__send_action(cmdDictDown)
-            sleep(keyboardText["duration_s"])
+        text: str = keyboardText["value"]
+        for batchStart in range(0, len(text), KEYBOARD_TEXT_BATCH_SIZE):
+            events: List[str] = list()
+            for c in text[batchStart : batchStart + KEYBOARD_TEXT_BATCH_SIZE]:
+                key: str = json.dumps(c)
+                events.append(KEY_EVENT_TMPL % ("true", key))
+                events.append(KEY_EVENT_TMPL % ("false", key))
 
-            cmdDictUp: Dict[str, Any] = {
-                "execute": "input-send-event",
-                "arguments": {
-                    "events": [
-                        {
-                            "type": "key",
-                            "data": {
-                                "down": False,
-                                "key": {"type": "qcode", "data": c},
-                            },
-                        },
-                    ],
-                },
-            }
-            self.__send_action(cmdDictUp)
+            self.__send_input_events(events)
             sleep(keyboardText["duration_s"])
 
     def __send_keyboard_key_action(self, keyboardKey: Dict[str, Any]) -> None:
@@ -340,38 +523,12 @@ class vm:
         Args:
             keyboardKey (Dict[str, Any]): The dict defining the keyboard key to send and how.
         """
-        cmdDictDown: Dict[str, Any] = {
-            "execute": "input-send-event",
-            "arguments": {
-                "events": [
-                    {
-                        "type": "key",
-                        "data": {
-                            "down": True,
-                            "key": {"type": "qcode", "data": keyboardKey["value"]},
-                        },
-                    },
-                ],
-            },
-        }
-        self.__send_action(cmdDictDown)
+        key: str = json.dumps(keyboardKey["value"])
+
+        self.__send_input_events([KEY_EVENT_TMPL % ("true", key)])
         sleep(keyboardKey["duration_s"])
 
-        cmdDictUp: Dict[str, Any] = {
-            "execute": "input-send-event",
-            "arguments": {
-                "events": [
-                    {
-                        "type": "key",
-                        "data": {
-                            "down": False,
-                            "key": {"type": "qcode", "data": keyboardKey["value"]},
-                        },
-                    },
-                ],
-            },
-        }
-        self.__send_action(cmdDictUp)
+        self.__send_input_events([KEY_EVENT_TMPL % ("false", key)])
         sleep(keyboardKey["duration_s"])
 
     def __send_mouse_move_action(self, mouseMove: Dict[str, Any]) -> None:
@@ -385,36 +542,14 @@ class vm:
         h: int
         w, h = self.__get_screen_size()
 
-        cmdDict: Dict[str, Any] = {
-            "execute": "input-send-event",
-            "arguments": {
-                "events": [
-                    {
-                        "type": "abs",
-                        "data": {
-                            "axis": "x",
-                            "value": 0,
-                        },
-                    },
-                    {
-                        "type": "abs",
-                        "data": {"axis": "y", "value": 0},
-                    },
-                    {
-                        "type": "rel",
-                        "data": {
-                            "axis": "x",
-                            "value": int(w * mouseMove["x_rel"]),
-                        },
-                    },
-                    {
-                        "type": "rel",
-                        "data": {"axis": "y", "value": int(h * mouseMove["y_rel"])},
-                    },
-                ],
-            },
-        }
-        self.__send_action(cmdDict)
+        self.__send_input_events(
+            [
+                AXIS_EVENT_TMPL % ("abs", "x", 0),
+                AXIS_EVENT_TMPL % ("abs", "y", 0),
+                AXIS_EVENT_TMPL % ("rel", "x", int(w * mouseMove["x_rel"])),
+                AXIS_EVENT_TMPL % ("rel", "y", int(h * mouseMove["y_rel"])),
+            ],
+        )
         sleep(mouseMove["duration_s"])
 
     def __send_mouse_click_action(self, mouseClick: Dict[str, Any]) -> None:
@@ -424,30 +559,10 @@ class vm:
         Args:
             mouseMove (Dict[str, Any]): The dict defining the mouse click action.
         """
-        cmdDictDown: Dict[str, Any] = {
-            "execute": "input-send-event",
-            "arguments": {
-                "events": [
-                    {
-                        "type": "btn",
-                        "data": {"down": True, "button": mouseClick["value"]},
-                    },
-                ],
-            },
-        }
-        self.__send_action(cmdDictDown)
+        button: str = json.dumps(mouseClick["value"])
+
+        self.__send_input_events([BTN_EVENT_TMPL % ("true", button)])
         sleep(mouseClick["duration_s"])
 
-        cmdDictUp: Dict[str, Any] = {
-            "execute": "input-send-event",
-            "arguments": {
-                "events": [
-                    {
-                        "type": "btn",
-                        "data": {"down": False, "button": mouseClick["value"]},
-                    },
-                ],
-            },
-        }
-        self.__send_action(cmdDictUp)
+        self.__send_input_events([BTN_EVENT_TMPL % ("false", button)])
         sleep(mouseClick["duration_s"])